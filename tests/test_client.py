@@ -17,7 +17,7 @@
 # USA
 #
 import unittest
-from textwrap import dedent
+from functools import lru_cache, partial
 from unittest.mock import Mock
 
 from dasbus.client.handler import ClientObjectHandler, GLibClient
@@ -33,35 +33,200 @@ gi.require_version("Gio", "2.0")
 from gi.repository import Gio
 
 
+# XML definitions of the tested DBus objects.
+_INTROSPECT_XML = """
+<node>
+    <interface name="Interface">
+        <method name="Method1"/>
+    </interface>
+</node>
+"""
+
+_METHOD_XML = """
+<node>
+    <interface name="Interface">
+        <method name="Method1"/>
+        <method name="Method2">
+            <arg direction="in" name="x" type="i"/>
+        </method>
+        <method name="Method3">
+            <arg direction="out" name="return" type="i"/>
+        </method>
+        <method name="Method4">
+            <arg direction="in" name="x" type="ad"/>
+            <arg direction="in" name="y" type="o"/>
+            <arg direction="out" name="return" type="(ib)"/>
+        </method>
+        <method name="Method5">
+            <arg direction="out" name="return_x" type="i"/>
+            <arg direction="out" name="return_y" type="i"/>
+        </method>
+    </interface>
+</node>
+"""
+
+_INVALID_METHOD_RESULT_XML = """
+<node>
+    <interface name="Interface">
+        <method name="Method">
+            <arg direction="out" name="return" type="t"/>
+        </method>
+    </interface>
+</node>
+"""
+
+_ASYNC_METHOD_XML = """
+<node>
+    <interface name="Interface">
+        <method name="Method1"/>
+        <method name="Method2">
+            <arg direction="in" name="x" type="i"/>
+            <arg direction="in" name="y" type="i"/>
+            <arg direction="out" name="return" type="i"/>
+        </method>
+    </interface>
+</node>
+"""
+
+_PROPERTY_XML = """
+<node>
+    <interface name="Interface">
+        <property name="Property1" type="i" access="readwrite" />
+        <property name="Property2" type="s" access="read" />
+        <property name="Property3" type="b" access="write" />
+    </interface>
+</node>
+"""
+
+_SIGNAL_XML = """
+<node>
+    <interface name="Interface">
+        <signal name="Signal1" />
+        <signal name="Signal2">
+            <arg direction="out" name="x" type="i"/>
+            <arg direction="out" name="y" type="s"/>
+        </signal>
+    </interface>
+</node>
+"""
+
+_INTERFACE_XML = """
+<node>
+    <interface name="Interface1">
+        <method name="Method1"/>
+    </interface>
+    <interface name="Interface2">
+        <method name="Method2"/>
+    </interface>
+    <interface name="Interface3">
+        <method name="Method1"/>
+        <method name="Method2"/>
+        <method name="Method3"/>
+    </interface>
+</node>
+"""
+
+
+# Attributes of the DBus connection used by the tests.
+_CONN_SPEC = [
+    "call_sync",
+    "call",
+    "signal_subscribe",
+    "signal_unsubscribe",
+]
+
+
+@lru_cache(maxsize=None)
+def _spec(xml):
+    """Return a DBus specification parsed from the given XML.
+
+    The specifications are read-only in the tests, so we can share them.
+    """
+    return DBusSpecification.from_xml(xml)
+
+
+def _call_finish(result_object):
+    """Finish a mocked DBus call."""
+    if isinstance(result_object, Exception):
+        raise result_object
+
+    return result_object
+
+
+def _finish_callback(callback, finish, *args):
+    """Call the callback with a result of the finished DBus call."""
+    callback(finish(), *args)
+
+
 class FakeException(Exception):
     """Fake exception from DBus calls."""
     pass
 
 
-class VariantTypeFactory(object):
-    """Return same objects for same type strings.
+# The original constructor of variant types.
+_new_variant_type = VariantType.new
+
+# The cache of variant types keyed by type strings.
+_VT_CACHE = {}
+
 
-    This factory allows to easily test calls with variant types.
+def _intern(type_string):
+    """Return the same variant type for the same type string.
+
+    The interned variant types allow to easily test calls with variant types.
     """
+    variant_type = _VT_CACHE.get(type_string)
+
+    if variant_type is None:
+        variant_type = _new_variant_type(type_string)
+        _VT_CACHE[type_string] = variant_type
+
+    return variant_type
+
+
+def _populate_cache():
+    """Pre-populate the cache with the type strings used in the tests."""
+    for type_string in ("s", "i", "b", "u", "o", "t", "ad", "()", "(s)",
+                        "(i)", "(ii)", "(ib)", "((ib))", "(ado)", "(v)",
+                        "(ss)", "(ssv)", "(is)"):
+        _intern(type_string)
+
+
+_populate_cache()
+
+
+class _Recorder(object):
+    """Record the last call of a mocked DBus method."""
+
+    __slots__ = [
+        "args",
+        "kwargs",
+        "return_value",
+        "side_effect",
+        "call_count"
+    ]
 
     def __init__(self):
-        self._types = {}
-        self._new = VariantType.new
-        self._str = VariantType.__str__
-        self._repr = VariantType.__repr__
+        self.reset()
 
-    def set_up(self):
-        VariantType.new = self.get
-        VariantType.__str__ = VariantType.dup_string
-        VariantType.__repr__ = VariantType.dup_string
+    def reset(self):
+        """Forget the recorded call and the reply."""
+        self.args = None
+        self.kwargs = None
+        self.return_value = None
+        self.side_effect = None
+        self.call_count = 0
 
-    def tear_down(self):
-        VariantType.new = self._new
-        VariantType.__str__ = self._str
-        VariantType.__repr__ = self._repr
+    def __call__(self, *args, **kwargs):
+        """Record the call and return the reply."""
+        self.args = args
+        self.kwargs = kwargs
+        self.call_count += 1
 
-    def get(self, type_string):
-        return self._types.setdefault(type_string, self._new(type_string))
+        if self.side_effect is not None:
+            raise self.side_effect
+
+        return self.return_value
 
 
 class DBusClientTestCase(unittest.TestCase):
@@ -69,24 +234,60 @@ class DBusClientTestCase(unittest.TestCase):
 
     NO_REPLY = get_variant("()", ())
 
+    @classmethod
+    def setUpClass(cls):
+        cls._original_str = VariantType.__str__
+        cls._original_repr = VariantType.__repr__
+
+        VariantType.new = staticmethod(_intern)
+        VariantType.__str__ = VariantType.dup_string
+        VariantType.__repr__ = VariantType.dup_string
+
+        # Variant types of the replies.
+        cls._RT_S = get_variant_type("(s)")
+        cls._RT_I = get_variant_type("(i)")
+        cls._RT_II = get_variant_type("(ii)")
+        cls._RT_IB = get_variant_type("((ib))")
+        cls._RT_V = get_variant_type("(v)")
+
+        # Invariant replies of the DBus calls.
+        cls._REPLY_INTROSPECT = get_variant("(s)", (_INTROSPECT_XML, ))
+        cls._REPLY_I0 = get_variant("(i)", (0, ))
+        cls._REPLY_I3 = get_variant("(i)", (3, ))
+        cls._REPLY_II = get_variant("(ii)", (1, 2))
+        cls._REPLY_IB = get_variant("((ib))", ((1, True), ))
+        cls._REPLY_IS = get_variant("(is)", (1, "Test"))
+        cls._REPLY_V_I20 = get_variant("(v)", (get_variant("i", 20), ))
+        cls._REPLY_V_SHELLO = get_variant("(v)", (get_variant("s", "Hello"), ))
+
+        # The error mapper shared by the tests.
+        cls._error_mapper = ErrorMapper()
+
+    @classmethod
+    def tearDownClass(cls):
+        VariantType.new = _new_variant_type
+        VariantType.__str__ = cls._original_str
+        VariantType.__repr__ = cls._original_repr
+
     def setUp(self):
         self.maxDiff = None
-        self.message_bus = Mock()
-        self.connection = self.message_bus.connection
-        self.error_mapper = ErrorMapper()
+        self.connection = Mock(spec_set=_CONN_SPEC)
+        self.message_bus = Mock(connection=self.connection)
+        self.connection.call_sync = _Recorder()
+        self.connection.call = _Recorder()
+        self.error_mapper = self._error_mapper
         self.service_name = "my.service"
         self.object_path = "/my/object"
         self.handler = None
         self.proxy = None
-
-        self.variant_type_factory = VariantTypeFactory()
-        self.variant_type_factory.set_up()
+        self._expected_user_data = None
 
     def tearDown(self):
-        self.variant_type_factory.tear_down()
+        # Remove the rules added by the test.
+        self.error_mapper.reset_rules()
 
-    def test_variant_type_factory(self):
-        """Test the variant type factory."""
+    def test_variant_type_cache(self):
+        """Test the cache of variant types."""
         self.assertEqual(str(get_variant_type("s")), "s")
         self.assertEqual(repr(get_variant_type("i")), "i")
 
@@ -105,17 +306,11 @@ class DBusClientTestCase(unittest.TestCase):
             error_mapper=self.error_mapper
         )
         self.handler = self.proxy._handler
-        self.handler._specification = DBusSpecification.from_xml(xml)
+        self.handler._specification = _spec(xml)
 
     def test_introspect(self):
         """Test the introspection."""
-        self._set_reply(get_variant("(s)", (dedent("""
-        <node>
-            <interface name="Interface">
-                <method name="Method1"/>
-            </interface>
-        </node>
-        """), )))
+        self._set_reply(self._REPLY_INTROSPECT)
 
         self.handler = ClientObjectHandler(
             self.message_bus,
@@ -126,7 +321,7 @@ class DBusClientTestCase(unittest.TestCase):
         self._check_call(
             "org.freedesktop.DBus.Introspectable",
             "Introspect",
-            reply_type=get_variant_type("(s)")
+            reply_type=self._RT_S
         )
 
         self.assertIn(
@@ -136,28 +331,7 @@ class DBusClientTestCase(unittest.TestCase):
 
     def test_method(self):
         """Test the method proxy."""
-        self._create_proxy("""
-        <node>
-            <interface name="Interface">
-                <method name="Method1"/>
-                <method name="Method2">
-                    <arg direction="in" name="x" type="i"/>
-                </method>
-                <method name="Method3">
-                    <arg direction="out" name="return" type="i"/>
-                </method>
-                <method name="Method4">
-                    <arg direction="in" name="x" type="ad"/>
-                    <arg direction="in" name="y" type="o"/>
-                    <arg direction="out" name="return" type="(ib)"/>
-                </method>
-                <method name="Method5">
-                    <arg direction="out" name="return_x" type="i"/>
-                    <arg direction="out" name="return_y" type="i"/>
-                </method>
-            </interface>
-        </node>
-        """)
+        self._create_proxy(_METHOD_XML)
 
         self.assertTrue(callable(self.proxy.Method1))
         self.assertEqual(self.proxy.Method1, self.proxy.Method1)
@@ -177,30 +351,30 @@ class DBusClientTestCase(unittest.TestCase):
             parameters=get_variant("(i)", (1, ))
         )
 
-        self._set_reply(get_variant("(i)", (0, )))
+        self._set_reply(self._REPLY_I0)
         self.assertEqual(self.proxy.Method3(), 0)
         self._check_call(
             "Interface",
             "Method3",
-            reply_type=get_variant_type("(i)")
+            reply_type=self._RT_I
         )
 
-        self._set_reply(get_variant("((ib))", ((1, True), )))
+        self._set_reply(self._REPLY_IB)
         self.assertEqual(self.proxy.Method4([1.2, 2.3], "/my/path"),
                          (1, True))
         self._check_call(
             "Interface",
             "Method4",
             parameters=get_variant("(ado)", ([1.2, 2.3], "/my/path")),
-            reply_type=get_variant_type("((ib))")
+            reply_type=self._RT_IB
         )
 
-        self._set_reply(get_variant("(ii)", (1, 2)))
+        self._set_reply(self._REPLY_II)
         self.assertEqual(self.proxy.Method5(), (1, 2))
         self._check_call(
             "Interface",
             "Method5",
-            reply_type=get_variant_type("(ii)")
+            reply_type=self._RT_II
         )
 
         # Handle unregistered remote exception.
@@ -258,15 +432,7 @@ class DBusClientTestCase(unittest.TestCase):
 
     def test_invalid_method_result(self):
         """Test a method proxy with an invalid result."""
-        self._create_proxy("""
-        <node>
-            <interface name="Interface">
-                <method name="Method">
-                    <arg direction="out" name="return" type="t"/>
-                </method>
-            </interface>
-        </node>
-        """)
+        self._create_proxy(_INVALID_METHOD_RESULT_XML)
 
         self._set_reply(get_variant("i", -1))
         with self.assertRaises(TypeError):
@@ -274,7 +440,7 @@ class DBusClientTestCase(unittest.TestCase):
 
     def _set_reply(self, reply_value):
         """Set the reply of the DBus call."""
-        self.connection.call_sync.reset_mock()
+        self.connection.call_sync.reset()
 
         if isinstance(reply_value, Exception):
             self.connection.call_sync.side_effect = reply_value
@@ -284,7 +450,9 @@ class DBusClientTestCase(unittest.TestCase):
     def _check_call(self, interface_name, method_name, parameters=None,
                     reply_type=None):
         """Check the DBus call."""
-        self.connection.call_sync.assert_called_once_with(
+        recorder = self.connection.call_sync
+        self.assertEqual(recorder.call_count, 1)
+        self.assertEqual(recorder.args, (
             self.service_name,
             self.object_path,
             interface_name,
@@ -294,81 +462,71 @@ class DBusClientTestCase(unittest.TestCase):
             DBUS_FLAG_NONE,
             GLibClient.DBUS_TIMEOUT_NONE,
             None
-        )
+        ))
+        self.assertEqual(recorder.kwargs, {})
 
-        self.connection.call_sync.reset_mock()
+        recorder.reset()
 
     def test_async_method(self):
         """Test asynchronous calls of a method proxy."""
-        self._create_proxy("""
-        <node>
-            <interface name="Interface">
-                <method name="Method1"/>
-                <method name="Method2">
-                    <arg direction="in" name="x" type="i"/>
-                    <arg direction="in" name="y" type="i"/>
-                    <arg direction="out" name="return" type="i"/>
-                </method>
-            </interface>
-        </node>
-        """)
+        self._create_proxy(_ASYNC_METHOD_XML)
         callback = Mock()
         callback_args = ("A", "B")
-        self.proxy.Method1(callback=callback, callback_args=callback_args)
+        finish_callback = partial(_finish_callback, callback)
+
+        self._expected_user_data = (
+            self.handler._method_callback,
+            (finish_callback, callback_args)
+        )
+
+        self.proxy.Method1(
+            callback=finish_callback, callback_args=callback_args
+        )
         self._check_async_call(
             "Interface",
-            "Method1",
-            callback,
-            callback_args
+            "Method1"
         )
 
-        self._finish_async_call(self.NO_REPLY, callback, callback_args)
+        self._finish_async_call(self.NO_REPLY)
         callback.assert_called_once_with(None, "A", "B")
+        callback.reset_mock()
 
-        callback = Mock()
-        callback_args = ("A", "B")
         self.proxy.Method2(
-            1, 2, callback=callback, callback_args=callback_args
+            1, 2, callback=finish_callback, callback_args=callback_args
         )
         self._check_async_call(
             "Interface",
             "Method2",
-            callback,
-            callback_args,
             get_variant("(ii)", (1, 2)),
-            get_variant_type("(i)")
+            self._RT_I
         )
 
-        self._finish_async_call(
-            get_variant("(i)", (3, )),
-            callback,
-            callback_args
-        )
+        self._finish_async_call(self._REPLY_I3)
         callback.assert_called_once_with(3, "A", "B")
+        callback.reset_mock()
 
         self.error_mapper.add_rule(ErrorRule(
             exception_type=FakeException,
             error_name="org.test.Unknown"
         ))
 
-        callback = Mock()
-        callback_args = ("A", "B")
-
         error = Gio.DBusError.new_for_dbus_error(
             "org.test.Unknown",
             "My message."
         )
 
         with self.assertRaises(FakeException) as cm:
-            self._finish_async_call(error, callback, callback_args)
+            self._finish_async_call(error)
 
         self.assertEqual(str(cm.exception), "My message.")
         callback.assert_not_called()
 
-    def _check_async_call(self, interface_name, method_name, callback,
-                          callback_args, parameters=None, reply_type=None):
+    def _check_async_call(self, interface_name, method_name, parameters=None,
+                          reply_type=None):
         """Check the asynchronous DBus call."""
-        self.connection.call.assert_called_once_with(
+        recorder = self.connection.call
+        self.assertEqual(recorder.call_count, 1)
+        self.assertEqual(recorder.args, (
             self.service_name,
             self.object_path,
             interface_name,
@@ -376,53 +534,32 @@ class DBusClientTestCase(unittest.TestCase):
             parameters,
             reply_type,
             DBUS_FLAG_NONE,
-            GLibClient.DBUS_TIMEOUT_NONE,
-            callback=GLibClient._async_call_finish,
-            user_data=(
-                self.handler._method_callback,
-                (callback, callback_args)
-            )
-        )
+            GLibClient.DBUS_TIMEOUT_NONE
+        ))
+        self.assertEqual(recorder.kwargs, {
+            "callback": GLibClient._async_call_finish,
+            "user_data": self._expected_user_data
+        })
 
-        self.connection.call.reset_mock()
+        recorder.reset()
 
-    def _finish_async_call(self, result, callback, callback_args):
+    def _finish_async_call(self, result):
         """Finish the asynchronous call."""
-        def _call_finish(result_object):
-            if isinstance(result_object, Exception):
-                raise result_object
-
-            return result_object
-
-        def _callback(finish, *args):
-            callback(finish(), *args)
-
         GLibClient._async_call_finish(
             source_object=Mock(call_finish=_call_finish),
             result_object=result,
-            user_data=(
-                self.handler._method_callback,
-                (_callback, callback_args)
-            )
+            user_data=self._expected_user_data
         )
 
     def test_property(self):
         """Test the property proxy."""
-        self._create_proxy("""
-        <node>
-            <interface name="Interface">
-                <property name="Property1" type="i" access="readwrite" />
-                <property name="Property2" type="s" access="read" />
-                <property name="Property3" type="b" access="write" />
-            </interface>
-        </node>
-        """)
+        self._create_proxy(_PROPERTY_XML)
 
         self._set_reply(self.NO_REPLY)
         self.proxy.Property1 = 10
         self._check_set_property("Property1", get_variant("i", 10))
 
-        self._set_reply(get_variant("(v)", (get_variant("i", 20), )))
+        self._set_reply(self._REPLY_V_I20)
         self.assertEqual(self.proxy.Property1, 20)
         self._check_get_property("Property1")
 
@@ -431,7 +568,7 @@ class DBusClientTestCase(unittest.TestCase):
 
         self.assertEqual(str(cm.exception), "Can't set DBus property.")
 
-        self._set_reply(get_variant("(v)", (get_variant("s", "Hello"), )))
+        self._set_reply(self._REPLY_V_SHELLO)
         self.assertEqual(self.proxy.Property2, "Hello")
         self._check_get_property("Property2")
 
@@ -475,22 +612,12 @@ class DBusClientTestCase(unittest.TestCase):
             "org.freedesktop.DBus.Properties",
             "Get",
             get_variant("(ss)", ("Interface", name)),
-            get_variant_type("(v)")
+            self._RT_V
         )
 
     def test_signal(self):
         """Test the signal publishing."""
-        self._create_proxy("""
-        <node>
-            <interface name="Interface">
-                <signal name="Signal1" />
-                <signal name="Signal2">
-                    <arg direction="out" name="x" type="i"/>
-                    <arg direction="out" name="y" type="s"/>
-                </signal>
-            </interface>
-        </node>
-        """)
+        self._create_proxy(_SIGNAL_XML)
 
         self.assertIsInstance(self.proxy.Signal1, Signal)
         self.assertEqual(self.proxy.Signal1, self.proxy.Signal1)
@@ -500,8 +627,7 @@ class DBusClientTestCase(unittest.TestCase):
         self.assertEqual(len(self.handler._subscriptions), 2)
 
         self._check_signal("Interface", "Signal2", self.proxy.Signal2.emit)
-        self._emit_signal(get_variant("(is)", (1, "Test")),
-                          self.proxy.Signal2.emit)
+        self._emit_signal(self._REPLY_IS, self.proxy.Signal2.emit)
         self.assertEqual(len(self.handler._subscriptions), 4)
 
         with self.assertRaises(AttributeError) as cm:
@@ -590,28 +716,12 @@ class DBusClientTestCase(unittest.TestCase):
             error_mapper=self.error_mapper
         )
         self.handler = self.proxy._handler
-        self.handler._specification = DBusSpecification.from_xml(xml)
+        self.handler._specification = _spec(xml)
 
     def test_interface_proxy(self):
         """Test the interface proxy."""
-        xml = """
-        <node>
-            <interface name="Interface1">
-                <method name="Method1"/>
-            </interface>
-            <interface name="Interface2">
-                <method name="Method2"/>
-            </interface>
-            <interface name="Interface3">
-                <method name="Method1"/>
-                <method name="Method2"/>
-                <method name="Method3"/>
-            </interface>
-        </node>
-        """
-
         # Test the first interface.
-        self._create_interface_proxy(xml, "Interface1")
+        self._create_interface_proxy(_INTERFACE_XML, "Interface1")
 
         # Test a valid method.
         self._set_reply(self.NO_REPLY)
@@ -626,7 +736,7 @@ class DBusClientTestCase(unittest.TestCase):
             self.proxy.Method3()
 
         # Test the second interface.
-        self._create_interface_proxy(xml, "Interface2")
+        self._create_interface_proxy(_INTERFACE_XML, "Interface2")
 
         # Test a valid method.
         self._set_reply(self.NO_REPLY)
@@ -641,7 +751,7 @@ class DBusClientTestCase(unittest.TestCase):
             self.proxy.Method3()
 
         # Test the third interface.
-        self._create_interface_proxy(xml, "Interface3")
+        self._create_interface_proxy(_INTERFACE_XML, "Interface3")
 
         # Test a valid method.
         self._set_reply(self.NO_REPLY)